@@ -1,7 +1,7 @@
 
 """
 Simple Flask API that takes an image frame, extracts MediaPipe hand landmarks,
-and returns the predicted ASL character using the trained RandomForest model.
+and returns the predicted ASL character using the trained classifier.
 Serves the frontend when deployed (e.g. on Render).
 """
 
@@ -9,9 +9,11 @@ import io
 import joblib
 import numpy as np
 import os
-import pandas as pd
+import queue
+import threading
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
+from threadpoolctl import threadpool_limits
 import cv2
 import mediapipe as mp
 
@@ -19,53 +21,259 @@ import mediapipe as mp
 # Paths relative to this file (backend/)
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(_BASE_DIR, "asl_model.pkl")
+ONNX_MODEL_PATH = os.path.join(_BASE_DIR, "asl_model.onnx")
+ONNX_CLASSES_PATH = os.path.join(_BASE_DIR, "asl_model_classes.npy")
+MLP_MODEL_PATH = os.path.join(_BASE_DIR, "asl_mlp.npz")
 FRONTEND_DIR = os.path.join(_BASE_DIR, "..", "frontend")
 
+# Frames are downscaled to this longest side before hand detection
+MAX_FRAME_SIDE = 320
+
+# MediaPipe landmark model: 1 = FULL (what the shipped model was trained on),
+# 0 = LITE (~2x faster). Only use 0 with a model trained on LITE landmarks,
+# i.e. extract_landmarks.py run with the same setting.
+HANDS_MODEL_COMPLEXITY = int(os.environ.get("HANDS_MODEL_COMPLEXITY", "1"))
+
 app = Flask(__name__)
-CORS(app)
 
-# Load model once at startup
-model = joblib.load(MODEL_PATH)
+# The bundled frontend is same-origin and needs no CORS; set FRONTEND_ORIGIN
+# only when serving the UI from a separate origin.
+FRONTEND_ORIGIN = os.environ.get("FRONTEND_ORIGIN")
+if FRONTEND_ORIGIN:
+    CORS(app, origins=[FRONTEND_ORIGIN])
+
+
+def _load_onnx_session():
+    """ONNX export and class labels from train_model.py, or (None, None) if not deployed."""
+    if not (os.path.exists(ONNX_MODEL_PATH) and os.path.exists(ONNX_CLASSES_PATH)):
+        return None, None
+    import onnxruntime as ort  # only needed when an ONNX export is deployed
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = 1  # single-sample requests; avoid thread-pool dispatch
+    session = ort.InferenceSession(
+        ONNX_MODEL_PATH, sess_options=opts, providers=["CPUExecutionProvider"]
+    )
+    return session, np.load(ONNX_CLASSES_PATH)
+
+
+def _load_mlp():
+    """Layers [(W, b), ...] and class labels of the MLP from distill.py, or (None, None)."""
+    if not os.path.exists(MLP_MODEL_PATH):
+        return None, None
+    with np.load(MLP_MODEL_PATH) as data:
+        n_layers = sum(1 for name in data.files if name.startswith("W"))
+        layers = [(data[f"W{i}"], data[f"b{i}"]) for i in range(n_layers)]
+        return layers, data["classes"]
+
+
+# Load model once at startup: the distilled MLP if present, then the ONNX export,
+# otherwise the pickle. Only the model that serves requests is loaded.
+model = None
+onnx_session = None
+mlp_layers, CLASSES = _load_mlp()
+if mlp_layers is None:
+    onnx_session, CLASSES = _load_onnx_session()
+if mlp_layers is None and onnx_session is None:
+    # Memory-map the pickle's numpy arrays so they load from the shared page cache
+    model = joblib.load(MODEL_PATH, mmap_mode="r")
+    # Random-forest pickles carry n_jobs=-1 from training; single-sample predicts should
+    # not dispatch joblib workers. (Gradient boosting has no n_jobs; it uses OpenMP,
+    # which _batch_worker limits to one thread.)
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    CLASSES = model.classes_
 
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=True,
-    max_num_hands=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+
+# MediaPipe solutions are not thread-safe, so each request thread gets its own detector
+# (and its own scratch buffers, see _thread_buffer)
+_tls = threading.local()
+
+
+def get_hands():
+    """Return this thread's MediaPipe Hands detector, creating it on first use."""
+    hands = getattr(_tls, "hands", None)
+    if hands is None:
+        hands = _tls.hands = mp_hands.Hands(
+            static_image_mode=True,
+            max_num_hands=1,
+            model_complexity=HANDS_MODEL_COMPLEXITY,
+            min_detection_confidence=0.5
+        )
+    return hands
+
+
+def _thread_buffer(name, shape, dtype=np.uint8):
+    """Per-thread scratch array, reallocated only when the requested shape changes."""
+    buf = getattr(_tls, name, None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype)
+        setattr(_tls, name, buf)
+    buf.flags.writeable = True  # may have been handed to MediaPipe read-only last time
+    return buf
+
+
+def landmarks_to_array(landmarks):
+    """Flatten 21 landmarks to a float32 array laid out as x0, y0, x1, y1, ..., x20, y20."""
+    return np.fromiter(
+        (v for lm in landmarks for v in (lm.x, lm.y)), dtype=np.float32, count=42
+    )
 
 
 def normalize_landmarks(landmarks):
     """Normalize landmarks relative to wrist (landmark 0) to make them scale and position invariant."""
-    wrist = landmarks[0]
-    normalized = []
-    for lm in landmarks:
-        normalized.append([lm.x - wrist.x, lm.y - wrist.y])
-    return normalized
+    arr = landmarks_to_array(landmarks).reshape(21, 2)
+    arr -= arr[0]
+    return arr.ravel()
+
+
+def mlp_predict_proba(X):
+    """Forward pass of the distilled MLP: ReLU hidden layers, softmax output."""
+    h = X
+    for W, b in mlp_layers[:-1]:
+        h = np.maximum(h @ W + b, 0)
+    W, b = mlp_layers[-1]
+    z = h @ W + b
+    z -= z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    return z / z.sum(axis=1, keepdims=True)
+
+
+def predict_proba(X):
+    """Class probabilities for a (n, 42) float32 array, columns ordered as CLASSES."""
+    if mlp_layers is not None:
+        return mlp_predict_proba(X)
+    if onnx_session is not None:
+        return onnx_session.run(["probabilities"], {"x": X})[0]
+    return model.predict_proba(X)
+
+
+# Concurrent /predict calls are coalesced into one predict_proba call. The batch
+# thread never sleeps to fill a batch: it takes whatever is already queued, so a
+# lone request is not delayed. A worker has GUNICORN_THREADS request threads, which
+# bounds how many rows can be queued at once.
+BATCH_MAX = int(os.environ.get("GUNICORN_THREADS", "2"))  # same default as entrypoint.sh
+PREDICT_TIMEOUT_S = 10
+
+_batch_queue = queue.Queue()
+_batch_thread = None
+_batch_thread_lock = threading.Lock()
+
+
+def _batch_worker():
+    # All model calls happen on this thread. Keep sklearn's OpenMP loops (gradient
+    # boosting predict) single-threaded: per-row work is tiny, and every call
+    # spreading across all cores would oversubscribe the CPU under concurrent
+    # workers and threads. OpenMP thread limits are per calling thread.
+    threadpool_limits(1, "openmp")
+    while True:
+        batch = [_batch_queue.get()]
+        while len(batch) < BATCH_MAX:
+            try:
+                batch.append(_batch_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            probs = predict_proba(np.vstack([item["coords"] for item in batch]))
+            for item, row in zip(batch, probs):
+                item["probs"] = row
+        except Exception as e:
+            for item in batch:
+                item["error"] = e
+        for item in batch:
+            item["done"].set()
+
+
+def predict_proba_batched(coords):
+    """Class probabilities for one (1, 42) sample, batched with concurrent requests."""
+    global _batch_thread
+    # Started lazily so it runs in the serving process (not a pre-fork parent),
+    # and restarted if it ever died
+    if _batch_thread is None or not _batch_thread.is_alive():
+        with _batch_thread_lock:
+            if _batch_thread is None or not _batch_thread.is_alive():
+                _batch_thread = threading.Thread(target=_batch_worker, daemon=True)
+                _batch_thread.start()
+
+    item = {"coords": coords, "done": threading.Event()}
+    _batch_queue.put(item)
+    if not item["done"].wait(PREDICT_TIMEOUT_S):
+        raise RuntimeError("prediction timed out")
+    if "error" in item:
+        raise item["error"]
+    return item["probs"]
+
+
+def decode_frame(img_array):
+    """Decode an encoded image to BGR, at half resolution when it is large enough.
+
+    JPEG supports scaled IDCT, so IMREAD_REDUCED_COLOR_2 decodes straight to the
+    smaller size. Small images are decoded at full size instead so hand detection
+    still gets at least MAX_FRAME_SIDE pixels to work with.
+    """
+    img = cv2.imdecode(img_array, cv2.IMREAD_REDUCED_COLOR_2)
+    if img is not None and max(img.shape[:2]) < MAX_FRAME_SIDE:
+        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+    return img
 
 
 def extract_landmarks(img_bgr):
-    """Return flattened (x,y) landmarks for a single hand or None if not found."""
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    result = hands.process(img_rgb)
+    """Return flattened (x,y) landmarks for a single hand or None if not found.
+
+    The frame is converted to RGB in place, so the caller's array is modified.
+    """
+    # MediaPipe works on ~256px crops; extra resolution only slows palm detection.
+    # Landmarks are normalized to [0, 1], so downscaling needs no correction.
+    scale = MAX_FRAME_SIDE / max(img_bgr.shape[:2])
+    if scale < 1:
+        h, w = img_bgr.shape[:2]
+        size = (round(w * scale), round(h * scale))
+        resized = _thread_buffer("resized", (size[1], size[0], 3))
+        img_bgr = cv2.resize(img_bgr, size, dst=resized, interpolation=cv2.INTER_AREA)
+
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB, dst=img_bgr)
+    img_rgb.flags.writeable = False  # lets MediaPipe use the buffer without copying it
+    result = get_hands().process(img_rgb)
     if not result.multi_hand_landmarks:
         return None
 
     hand_landmarks = result.multi_hand_landmarks[0]
-    
-    # Extract raw landmarks (same format as training: x0, y0, x1, y1, ..., x20, y20)
-    coords = []
-    for lm in hand_landmarks.landmark:
-        coords.extend([lm.x, lm.y])
-    
-    # Convert to DataFrame with proper feature names to match training
-    feature_names = []
-    for i in range(21):
-        feature_names.extend([f"x{i}", f"y{i}"])
-    df = pd.DataFrame([coords], columns=feature_names)
-    
-    return df
+
+    # Raw landmarks in training order as a (1, 42) array (a view of the one allocation).
+    # The model is fit on a plain array, so no feature names are needed.
+    return landmarks_to_array(hand_landmarks.landmark).reshape(1, 42)
+
+
+def predict_frame(img_bgr):
+    """Run hand detection + classification on a BGR frame; returns (payload, status)."""
+    landmarks = extract_landmarks(img_bgr)
+    if landmarks is None:
+        return {"prediction": None, "message": "no hand detected"}, 200
+
+    probs = predict_proba_batched(landmarks)
+
+    # Top 3 by partial selection; only those 3 get sorted
+    top3 = np.argpartition(probs, -3)[-3:]
+    top3 = top3[np.argsort(probs[top3])[::-1]]
+    labels = CLASSES[top3].tolist()
+    confidences = probs[top3].tolist()
+    top_predictions = [
+        {"label": label, "confidence": confidence}
+        for label, confidence in zip(labels, confidences)
+    ]
+    best_label, best_prob = labels[0], confidences[0]
+
+    # Only return prediction if confidence is above threshold
+    confidence_threshold = 0.3  # Adjust this based on your needs
+
+    if best_prob < confidence_threshold:
+        payload = {"prediction": None, "message": f"low confidence ({best_prob:.2f})"}
+    else:
+        payload = {"prediction": best_label, "confidence": best_prob}
+    payload["top_predictions"] = top_predictions
+    return payload, 200
 
 
 @app.route("/health", methods=["GET"])
@@ -84,44 +292,17 @@ def predict():
 
     # Decode image bytes to OpenCV BGR
     img_array = np.frombuffer(img_bytes, np.uint8)
-    img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+    img = decode_frame(img_array)
     if img is None:
         return jsonify({"error": "invalid image"}), 400
 
-    landmarks = extract_landmarks(img)
-    if landmarks is None:
-        return jsonify({"prediction": None, "message": "no hand detected"}), 200
-
     try:
-        probs = model.predict_proba(landmarks)[0]
-        best_idx = int(np.argmax(probs))
-        best_label = model.classes_[best_idx]
-        best_prob = float(probs[best_idx])
-        
-        # Only return prediction if confidence is above threshold
-        confidence_threshold = 0.3  # Adjust this based on your needs
-        
-        if best_prob < confidence_threshold:
-            return jsonify({
-                "prediction": None,
-                "message": f"low confidence ({best_prob:.2f})",
-                "top_predictions": [
-                    {"label": model.classes_[i], "confidence": float(probs[i])}
-                    for i in np.argsort(probs)[-3:][::-1]
-                ]
-            }), 200
-
-        return jsonify({
-            "prediction": best_label,
-            "confidence": best_prob,
-            "top_predictions": [
-                {"label": model.classes_[i], "confidence": float(probs[i])}
-                for i in np.argsort(probs)[-3:][::-1]
-            ]
-        })
+        payload, status = predict_frame(img)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    return jsonify(payload), status
+
 
 # Serve frontend (for Render / single-service deploy)
 @app.route("/")
@@ -147,5 +328,8 @@ def frontend_static(path):
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    # Local development only; production runs under gunicorn (see entrypoint.sh).
+    # Single-threaded: the threaded dev server starts a new thread per request, which
+    # would build a new thread-local MediaPipe detector for every /predict.
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG") == "1", threaded=False)
 
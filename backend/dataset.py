@@ -0,0 +1,21 @@
+"""
+Landmark dataset loading shared by train_model.py and distill.py.
+"""
+
+import os
+import pandas as pd
+import numpy as np
+
+
+def load_dataset(npz_path="asl_landmarks.npz", csv_path="asl_landmarks.csv"):
+    """Return the landmark dataset as a DataFrame (x0, y0, ..., x20, y20, label).
+
+    Reads the binary .npz written by extract_landmarks.py, or the CSV export
+    if that's all there is.
+    """
+    if os.path.exists(npz_path):
+        with np.load(npz_path) as data:
+            df = pd.DataFrame(data["X"], columns=data["columns"])
+            df["label"] = data["y"]
+        return df
+    return pd.read_csv(csv_path)
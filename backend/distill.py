@@ -0,0 +1,73 @@
+"""
+Distill the trained tree model (asl_model.pkl) into a small MLP (42 -> 64 -> 64 -> classes).
+
+The MLP's predict is two small matrix products plus a softmax, which app.py runs
+directly in NumPy from asl_mlp.npz instead of walking every tree of the ensemble.
+Run after train_model.py.
+"""
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.neural_network import MLPClassifier
+from sklearn.metrics import accuracy_score, classification_report
+import joblib
+from dataset import load_dataset
+
+AUGMENT_COPIES = 4  # jittered copies of each training sample
+JITTER = 0.01  # +/- 1% of the normalized image size
+
+# Teacher model and dataset
+teacher = joblib.load("asl_model.pkl")
+df = load_dataset()
+df = df[df["label"].isin(teacher.classes_)].reset_index(drop=True)
+print(f"Dataset shape: {df.shape}")
+
+X = df.drop("label", axis=1).to_numpy(dtype=np.float32)
+y = df["label"].to_numpy()
+
+# Same split as train_model.py, so the test set is unseen by teacher and student
+X_train, X_test, y_train, y_test = train_test_split(
+    X, y, test_size=0.2, random_state=42, stratify=y
+)
+
+# Augment with jittered landmarks and label everything with the teacher
+rng = np.random.default_rng(42)
+X_aug = np.concatenate(
+    [X_train]
+    + [X_train + rng.uniform(-JITTER, JITTER, X_train.shape).astype(np.float32)
+       for _ in range(AUGMENT_COPIES)]
+)
+y_aug = teacher.predict(X_aug)
+print(f"Distillation samples: {len(X_aug)}")
+
+# sklearn's MLP only trains on hard labels, so the student learns the teacher's argmax
+student = MLPClassifier(
+    hidden_layer_sizes=(64, 64),
+    activation="relu",
+    early_stopping=True,
+    max_iter=200,
+    random_state=42,
+)
+
+print("\nTraining student MLP...")
+student.fit(X_aug, y_aug)
+
+# Evaluate against the true labels and against the teacher
+y_pred = student.predict(X_test)
+acc = accuracy_score(y_test, y_pred)
+teacher_acc = accuracy_score(y_test, teacher.predict(X_test))
+agreement = accuracy_score(teacher.predict(X_test), y_pred)
+print(f"\nStudent test accuracy: {acc * 100:.2f}%")
+print(f"Teacher test accuracy: {teacher_acc * 100:.2f}%")
+print(f"Student/teacher agreement: {agreement * 100:.2f}%")
+
+print("\nClassification Report:")
+print(classification_report(y_test, y_pred))
+
+# Save weights as plain arrays (W0, b0, W1, b1, ...) for the NumPy forward pass in app.py
+layers = {}
+for i, (W, b) in enumerate(zip(student.coefs_, student.intercepts_)):
+    layers[f"W{i}"] = W.astype(np.float32)
+    layers[f"b{i}"] = b.astype(np.float32)
+np.savez("asl_mlp.npz", classes=student.classes_.astype(str), **layers)
+print("\nStudent model saved as asl_mlp.npz")
@@ -0,0 +1,13 @@
+#!/bin/sh
+# Production server for the API + frontend (used by render.yaml).
+# gthread workers run requests on threads, and every thread builds its own MediaPipe
+# detector, so memory grows with WEB_CONCURRENCY x GUNICORN_THREADS. The defaults
+# (1 worker, 2 threads) stay close to the old single sync worker for the free plan;
+# raise them only on an instance with measured headroom.
+# --preload loads the model once in the parent so extra workers share its memory.
+exec gunicorn app:app \
+    --bind "0.0.0.0:${PORT:-5000}" \
+    --worker-class gthread \
+    --workers "${WEB_CONCURRENCY:-1}" \
+    --threads "${GUNICORN_THREADS:-2}" \
+    --preload
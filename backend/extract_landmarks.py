@@ -1,54 +1,92 @@
 import cv2
 import os
 import mediapipe as mp
+import multiprocessing
+import multiprocessing.util
 import numpy as np
-import csv
 
 
 DATASET_PATH = r"C:\Users\junai\Documents\asl-translator\backend\asl_alphabet_train"
-print("Looking for dataset at:", os.path.abspath(DATASET_PATH))
-OUTPUT_FILE = "asl_landmarks.csv"
+OUTPUT_FILE = "asl_landmarks.npz"
+
+# Must match the API's HANDS_MODEL_COMPLEXITY (1 = FULL, 0 = LITE)
+HANDS_MODEL_COMPLEXITY = int(os.environ.get("HANDS_MODEL_COMPLEXITY", "1"))
 
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(static_image_mode=True, max_num_hands=1)
+hands = None  # one detector per worker process, set by _init_worker
 
-with open(OUTPUT_FILE, "w", newline="") as f:
-    writer = csv.writer(f)
 
-    # header
-    header = []
-    for i in range(21):
-        header += [f"x{i}", f"y{i}"]
-    header.append("label")
-    writer.writerow(header)
+def _init_worker():
+    global hands
+    hands = mp_hands.Hands(
+        static_image_mode=True, max_num_hands=1, model_complexity=HANDS_MODEL_COMPLEXITY
+    )
+    # Close the detector when the worker exits normally (pool.close() + join()).
+    # Unlike atexit, this also runs in forked workers.
+    multiprocessing.util.Finalize(None, hands.close, exitpriority=10)
+
+
+def process_label_dir(label):
+    """Return (label, (n, 42) float32 landmark array) for one label directory."""
+    label_path = os.path.join(DATASET_PATH, label)
+    rows = []
 
-    for label in os.listdir(DATASET_PATH):
-        label_path = os.path.join(DATASET_PATH, label)
+    for img_name in os.listdir(label_path):
+        img_path = os.path.join(label_path, img_name)
+        img = cv2.imread(img_path)
 
-        if not os.path.isdir(label_path):
+        if img is None:
             continue
 
-        print(f"Processing {label}...")
+        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        img_rgb.flags.writeable = False  # lets MediaPipe use the buffer without copying it
+        result = hands.process(img_rgb)
 
-        for img_name in os.listdir(label_path):
-            img_path = os.path.join(label_path, img_name)
-            img = cv2.imread(img_path)
+        if result.multi_hand_landmarks:
+            hand_landmarks = result.multi_hand_landmarks[0]
 
-            if img is None:
-                continue
+            # Same layout as the API's landmarks_to_array: x0, y0, ..., x20, y20
+            rows.append(np.fromiter(
+                (v for lm in hand_landmarks.landmark for v in (lm.x, lm.y)),
+                dtype=np.float32,
+                count=42,
+            ))
 
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            result = hands.process(img_rgb)
+    return label, np.array(rows, dtype=np.float32).reshape(-1, 42)
 
-            if result.multi_hand_landmarks:
-                hand_landmarks = result.multi_hand_landmarks[0]
-                row = []
 
-                for lm in hand_landmarks.landmark:
-                    row.extend([lm.x, lm.y])
+if __name__ == "__main__":
+    print("Looking for dataset at:", os.path.abspath(DATASET_PATH))
+
+    labels = [
+        label for label in os.listdir(DATASET_PATH)
+        if os.path.isdir(os.path.join(DATASET_PATH, label))
+    ]
+
+    # header
+    header = []
+    for i in range(21):
+        header += [f"x{i}", f"y{i}"]
+
+    # Label directories are independent, so spread them across all cores.
+    # imap keeps the output in label order so the dataset is reproducible.
+    features, targets = [], []
+    with multiprocessing.Pool(os.cpu_count(), initializer=_init_worker) as pool:
+        for label, rows in pool.imap(process_label_dir, labels):
+            print(f"Processed {label}: {len(rows)} hands")
+            features.append(rows)
+            targets.append(np.full(len(rows), label))
+        # Let workers exit on their own so their detectors get closed
+        # (leaving the with-block alone would terminate them)
+        pool.close()
+        pool.join()
 
-                row.append(label)
-                writer.writerow(row)
+    # Binary arrays load far faster than parsing a CSV
+    np.savez_compressed(
+        OUTPUT_FILE,
+        X=np.concatenate(features),
+        y=np.concatenate(targets),
+        columns=np.array(header),
+    )
 
-hands.close()
-print("Landmark extraction completed.")
+    print("Landmark extraction completed.")